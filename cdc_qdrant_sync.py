@@ -1,20 +1,43 @@
 
 import os
-import json
-import re
+import asyncio
 import time
 import signal
-from datetime import timezone
+import hashlib
+from array import array
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from collections import OrderedDict, deque
+from datetime import date, datetime, timezone
 from dateutil import parser
 
+import httpx
+from cachetools import TTLCache
+import orjson
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from kafka import KafkaConsumer
-
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, PointStruct, Distance, PointIdsList
+from psycopg2.pool import ThreadedConnectionPool
+from confluent_kafka import Consumer, TopicPartition
+from selectolax.parser import HTMLParser
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.models import (
+    VectorParams,
+    PointStruct,
+    Distance,
+    PointIdsList,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    HnswConfigDiff,
+    OptimizersConfigDiff,
+    PayloadSchemaType,
+)
 
 from google import genai
+from google.genai import errors as genai_errors
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,6 +51,9 @@ DB_USER = "your user"
 DB_PWD = "your password"
 DB_NAME = "your database name"
 SCHEMA = "your schema name"
+DB_READ_HOST = DB_HOST        # point at a read replica to offload CDC lookups
+DB_POOL_MIN = 2
+DB_POOL_MAX = 16
 
 QDRANT_URL = "your qdrant url"
 QDRANT_COLLECTION = "your collection name"
@@ -40,32 +66,81 @@ KAFKA_TOPIC = "your kafka topic"
 KAFKA_BOOTSTRAP = "your kafka bootstrap servers"
 
 HEARTBEAT_INTERVAL = 30
+LOG_LEVEL = logging.INFO      # DEBUG adds per-batch upsert/delete lines
+
+DESCRIPTION_PREVIEW_LENGTH = 200
+
+# payload fields filtered on by the search API
+PAYLOAD_INDEXES = {
+    "priority": PayloadSchemaType.KEYWORD,
+    "status": PayloadSchemaType.KEYWORD,
+    "progress": PayloadSchemaType.KEYWORD,
+    "assigned_to_name": PayloadSchemaType.KEYWORD,
+    "assigned_by_name": PayloadSchemaType.KEYWORD,
+    "task_id": PayloadSchemaType.INTEGER,
+    "target_date_ts": PayloadSchemaType.INTEGER,
+    "updated_at_ts": PayloadSchemaType.INTEGER,
+}
+
+KAFKA_MAX_POLL_RECORDS = 500
+KAFKA_FETCH_MIN_BYTES = 64 * 1024
+KAFKA_FETCH_MAX_WAIT_MS = 200
+KAFKA_MAX_PARTITION_FETCH_BYTES = 5 * 1024 * 1024
+
+EMBED_BATCH_SIZE = 100        # texts per embed_content request
+UPSERT_BATCH_SIZE = 256       # points per Qdrant upsert during bulk index
+CDC_FLUSH_SIZE = 100          # CDC events a shard worker applies per batch
+CDC_SHARDS = 8                # concurrent CDC workers, keyed by task id
+CDC_RETRY_DELAY = 1           # seconds to wait before redelivering a failed batch
+CDC_RETRY_MAX_DELAY = 30      # cap for the doubling redelivery backoff
+CDC_MAX_ATTEMPTS = 5          # non-transient failures before a batch is skipped
+BULK_CONCURRENCY = 16         # upsert batches in flight during bulk index
+BULK_FETCH_SIZE = 2000        # rows per round-trip on the bulk index cursor
+EMBED_MAX_CONCURRENCY = 64    # embed_content requests in flight
+EMBED_HEDGE_DELAY = 5.0       # hedge delay until enough latencies are sampled
+EMBED_HEDGE_PERCENTILE = 0.95 # afterwards, only requests slower than p95 hedge
+EMBED_LATENCY_SAMPLES = 200   # recent request latencies kept for the p95
+EMBED_TIMEOUT = 60            # seconds per embedding batch, hedges included
+EMBED_CACHE_SIZE = 20_000     # cached embeddings, 12 KB each (~240 MB)
+USER_CACHE_SIZE = 50_000      # user id -> name entries kept for CDC enrichment
+USER_CACHE_TTL = 300          # seconds; _user isn't captured, so renames age out
 
 # ==============================
-# ENUM MAPS (DB → STRING)
+# ENUM LOOKUP TABLES (DB → STRING)
 # ==============================
-PRIORITY_MAP = {
-    1: "low",
-    2: "medium",
-    3: "high",
-    4: "urgent"
-}
+# indexed directly by the DB value; None marks an unused slot
+PRIORITY_LUT = (None, "low", "medium", "high", "urgent")
 
-STATUS_MAP = {
-    0: "deleted",
-    1: "active",
-    2: "pending",
-    3: "declined",
-    4: "rejected",
-    5: "draft",
-    6: "schedule_later"
-}
+STATUS_LUT = (
+    "deleted",
+    "active",
+    "pending",
+    "declined",
+    "rejected",
+    "draft",
+    "schedule_later"
+)
 
-PROGRESS_MAP = {
-    0: "todo",
-    1: "doing",
-    2: "done"
-}
+PROGRESS_LUT = ("todo", "doing", "done")
+
+def lookup(lut, i):
+    return lut[i] if isinstance(i, int) and 0 <= i < len(lut) else None
+
+# ==============================
+# LOGGING
+# ==============================
+# QueueHandler merges the message args in the calling thread, but the
+# formatting of the final line and the stderr write happen on the
+# listener thread
+log_queue = queue.Queue(-1)
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+log_listener = QueueListener(log_queue, log_handler)
+
+logger = logging.getLogger("cdc")
+logger.setLevel(LOG_LEVEL)
+logger.addHandler(QueueHandler(log_queue))
+logger.propagate = False
 
 # ==============================
 # GLOBAL STATE
@@ -76,88 +151,294 @@ processed_events = 0
 # ==============================
 # SIGNAL HANDLING
 # ==============================
+# only flips the flag: logging here could deadlock on the log queue's lock
+# if the signal lands while the main thread is inside a logger call
 def shutdown_handler(sig, frame):
     global running
-    print("🛑 Graceful shutdown requested...")
     running = False
 
 signal.signal(signal.SIGINT, shutdown_handler)
 signal.signal(signal.SIGTERM, shutdown_handler)
 
+# ==============================
+# LRU CACHE
+# ==============================
+class LRUCache(OrderedDict):
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+# sha256(semantic text) -> float32 embedding, so CDC updates that leave
+# the embedded fields untouched skip the GenAI round-trip; array('f')
+# keeps an entry at 12 KB instead of ~100 KB for a list of floats
+embedding_cache = LRUCache(EMBED_CACHE_SIZE)
+user_name_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
 # ==============================
 # CLIENTS
 # ==============================
-qdrant = QdrantClient(url=QDRANT_URL)
+qdrant = AsyncQdrantClient(url=QDRANT_URL)
 genai_client = genai.Client(api_key=GENAI_API_KEY)
+embed_semaphore = asyncio.Semaphore(EMBED_MAX_CONCURRENCY)
+embed_latencies = deque(maxlen=EMBED_LATENCY_SAMPLES)
 
 # ==============================
 # HELPERS
 # ==============================
 def to_epoch(dt):
-    if not dt:
+    if dt is None or isinstance(dt, bool):
         return None
+    if isinstance(dt, int):
+        # Debezium's default temporal mode sends date as days and timestamp
+        # as millis or micros since the epoch; the magnitude tells them
+        # apart (anything in between is taken as plain seconds)
+        if abs(dt) < 10 ** 6:
+            return dt * 86400
+        if abs(dt) < 10 ** 11:
+            return dt
+        if abs(dt) < 10 ** 14:
+            return dt // 1000
+        return dt // 1_000_000
+    if isinstance(dt, date) and not isinstance(dt, datetime):
+        dt = datetime(dt.year, dt.month, dt.day)
     if isinstance(dt, str):
-        try:
-            dt = parser.isoparse(dt)
-        except Exception:
+        if not dt:
             return None
-    return int(dt.replace(tzinfo=timezone.utc).timestamp())
-
-def generate_embedding(text, retries=3):
+        # fromisoformat is C-accelerated and covers Debezium's ISO output;
+        # dateutil only handles the odd formats it rejects
+        try:
+            dt = datetime.fromisoformat(dt)
+        except ValueError:
+            try:
+                dt = parser.isoparse(dt)
+            except Exception:
+                return None
+    if not isinstance(dt, datetime):
+        return None
+    # naive values are UTC; aware values keep their own offset
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+# network faults, timeouts, throttling and 5xx: worth retrying as-is
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    httpx.TransportError,
+    ResponseHandlingException,
+    genai_errors.ServerError,
+    psycopg2.OperationalError,
+)
+
+def is_transient(e):
+    if isinstance(e, TRANSIENT_ERRORS):
+        return True
+    if isinstance(e, genai_errors.ClientError):
+        return e.code == 429
+    if isinstance(e, UnexpectedResponse):
+        return e.status_code == 429 or (e.status_code or 0) >= 500
+    return False
+
+async def request_embeddings(texts):
+    # callers hold an embed_semaphore slot
+    started = time.monotonic()
+    resp = await genai_client.aio.models.embed_content(
+        model=EMBEDDING_MODEL,
+        contents=texts
+    )
+    embed_latencies.append(time.monotonic() - started)
+    return [e.values for e in resp.embeddings]
+
+def hedge_delay():
+    if len(embed_latencies) < EMBED_LATENCY_SAMPLES // 10:
+        return EMBED_HEDGE_DELAY
+    ordered = sorted(embed_latencies)
+    return ordered[int(len(ordered) * EMBED_HEDGE_PERCENTILE)]
+
+async def hedged_embed(texts):
+    # duplicate a request slower than the recent p95 once and keep whichever
+    # answer lands first; the timer only starts once a slot is held
+    tasks = set()
+    try:
+        async with embed_semaphore:
+            first = asyncio.create_task(request_embeddings(texts))
+            tasks.add(first)
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay())
+
+            # no spare slot: a duplicate would only queue behind real work
+            if done or embed_semaphore.locked():
+                return await first
+
+            async with embed_semaphore:
+                tasks.add(asyncio.create_task(request_embeddings(texts)))
+                pending = set(tasks)
+                error = None
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        if task.exception() is None:
+                            return task.result()
+                        error = task.exception()
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def embed_batch(texts, retries=3):
+    # transient failures are retried and finally raised; a rejected batch
+    # is bisected so only the offending text comes back as None
     for i in range(retries):
         try:
-            return genai_client.models.embed_content(
-                model=EMBEDDING_MODEL,
-                contents=text
-            ).embeddings[0].values
+            return await asyncio.wait_for(hedged_embed(texts), EMBED_TIMEOUT)
         except Exception as e:
-            print(f"⚠ Embedding retry {i+1}: {e}")
-            time.sleep(1)
-    return None
+            if not is_transient(e):
+                error = e
+                break
+            if i == retries - 1:
+                raise
+            logger.warning("⚠ Embedding retry %d: %s", i + 1, e)
+            await asyncio.sleep(2 ** i)
+
+    if len(texts) == 1:
+        logger.error("❌ Embedding rejected: %s", error)
+        return [None]
+
+    mid = len(texts) // 2
+    left, right = await asyncio.gather(
+        embed_batch(texts[:mid], retries),
+        embed_batch(texts[mid:], retries)
+    )
+    return left + right
+
+async def generate_embeddings(texts):
+    keys = [hashlib.sha256(t.encode()).digest() for t in texts]
+
+    found = {}
+    missing = {}
+    for key, text in zip(keys, texts):
+        embedding = embedding_cache.get(key)
+        if embedding is not None:
+            found[key] = embedding.tolist()
+        else:
+            missing.setdefault(key, text)
+
+    missing_keys = list(missing)
+    missing_texts = list(missing.values())
+    batches = await asyncio.gather(*(
+        embed_batch(missing_texts[start:start + EMBED_BATCH_SIZE])
+        for start in range(0, len(missing_texts), EMBED_BATCH_SIZE)
+    ))
+    embeddings = [e for batch in batches for e in batch]
+
+    for key, embedding in zip(missing_keys, embeddings):
+        if embedding:
+            embedding_cache.put(key, array("f", embedding))
+            found[key] = embedding
+
+    return [found.get(key) for key in keys]
 
 # ==============================
 # QDRANT SETUP
 # ==============================
-def setup_qdrant():
-    if not qdrant.collection_exists(QDRANT_COLLECTION):
-        qdrant.create_collection(
+async def setup_qdrant():
+    if not await qdrant.collection_exists(QDRANT_COLLECTION):
+        await qdrant.create_collection(
             collection_name=QDRANT_COLLECTION,
             vectors_config=VectorParams(
                 size=VECTOR_SIZE,
-                distance=Distance.COSINE
+                distance=Distance.COSINE,
+                on_disk=True
+            ),
+            # int8 copies stay in RAM for search (4x smaller than float32);
+            # the originals on disk are only read to rescore the top hits
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            ),
+            # the HNSW graph is mmapped so the collection can outgrow RAM;
+            # hot pages stay in the OS page cache (vectors are already
+            # on disk via VectorParams.on_disk)
+            hnsw_config=HnswConfigDiff(
+                on_disk=True,
+                m=16,
+                ef_construct=128
+            ),
+            # threshold is in KB of vectors per segment: ~4k points at
+            # 12 KB (3072 float32) each before a segment gets an HNSW index
+            optimizers_config=OptimizersConfigDiff(
+                indexing_threshold=50000
             )
         )
-        print("🆕 Qdrant collection created")
+        logger.info("🆕 Qdrant collection created")
     else:
-        print("✅ Qdrant collection exists")
+        logger.info("✅ Qdrant collection exists")
+
+    # idempotent, so collections created before these indexes get them too
+    await asyncio.gather(*(
+        qdrant.create_payload_index(
+            collection_name=QDRANT_COLLECTION,
+            field_name=field,
+            field_schema=schema
+        )
+        for field, schema in PAYLOAD_INDEXES.items()
+    ))
 
 # ==============================
 # SEMANTIC TEXT (FOR EMBEDDINGS)
 # ==============================
+def strip_html(html):
+    if not html:
+        return ""
+    # plain text needs no parse; markup goes through the C parser, which
+    # also decodes entities and copes with "<" inside attribute values
+    if "<" not in html and "&" not in html:
+        return html
+    return HTMLParser(html).text()
+
 def build_semantic_text(task):
-    description = re.sub('<[^<]+?>', '', task.get("description") or "")
+    description = strip_html(task.get("description"))
     return f"""
     Task title: {task.get("title", "")}
     Description: {description}
-    Priority: {PRIORITY_MAP.get(task.get("priority"), "")}
-    Status: {STATUS_MAP.get(task.get("status"), "")}
+    Priority: {lookup(PRIORITY_LUT, task.get("priority")) or ""}
+    Status: {lookup(STATUS_LUT, task.get("status")) or ""}
     """.strip()
 
 # ==============================
 # QDRANT PAYLOAD (UI READY)
 # ==============================
 def build_task_payload(task):
+    # full description stays in Postgres; the payload only carries a
+    # plain-text preview for display
+    description = strip_html(task.get("description"))
     return {
         # identity
         "task_id": task["id"],
 
         # 🔥 UI DISPLAY FIELDS (STRINGS)
         "title": task.get("title"),
-        "description": task.get("description"),
+        "description_preview": description[:DESCRIPTION_PREVIEW_LENGTH] or None,
 
-        "priority": PRIORITY_MAP.get(task.get("priority")),
-        "status": STATUS_MAP.get(task.get("status")),
-        "progress": PROGRESS_MAP.get(task.get("progress")),
+        "priority": lookup(PRIORITY_LUT, task.get("priority")),
+        "status": lookup(STATUS_LUT, task.get("status")),
+        "progress": lookup(PROGRESS_LUT, task.get("progress")),
 
         # 🔥 USER NAMES (STRINGS)
         "assigned_by_name": task.get("assigned_by_name"),
@@ -171,66 +452,233 @@ def build_task_payload(task):
 # ==============================
 # USER NAME ENRICHMENT (CDC)
 # ==============================
-def enrich_user_names(task, cursor):
-    if task.get("by_user_id"):
-        cursor.execute(
-            f"SELECT name FROM {SCHEMA}._user WHERE id = %s",
-            (task["by_user_id"],)
-        )
-        r = cursor.fetchone()
-        task["assigned_by_name"] = r["name"] if r else None
-
-    if task.get("to_user_id"):
-        cursor.execute(
-            f"SELECT name FROM {SCHEMA}._user WHERE id = %s",
-            (task["to_user_id"],)
-        )
-        r = cursor.fetchone()
-        task["assigned_to_name"] = r["name"] if r else None
+def fetch_user_names(pool, user_ids):
+    # runs in a worker thread so a slow DB never stalls the Kafka loop
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(
+                f"SELECT id, name FROM {SCHEMA}._user WHERE id = ANY(%s)",
+                (user_ids,)
+            )
+            return cursor.fetchall()
+    finally:
+        pool.putconn(conn)
+
+async def enrich_user_names(tasks, pool):
+    user_ids = {
+        task[key]
+        for task in tasks
+        for key in ("by_user_id", "to_user_id")
+        if task.get(key)
+    }
 
-    return task
+    names = {}
+    missing_ids = []
+    for uid in user_ids:
+        name = user_name_cache.get(uid)
+        if name is not None:
+            names[uid] = name
+        else:
+            missing_ids.append(uid)
+
+    if missing_ids:
+        rows = await asyncio.to_thread(fetch_user_names, pool, missing_ids)
+        for r in rows:
+            names[r["id"]] = r["name"]
+            user_name_cache[r["id"]] = r["name"]
+
+    for task in tasks:
+        if task.get("by_user_id"):
+            task["assigned_by_name"] = names.get(task["by_user_id"])
+        if task.get("to_user_id"):
+            task["assigned_to_name"] = names.get(task["to_user_id"])
+
+    return tasks
 
 # ==============================
 # UPSERT / DELETE
 # ==============================
-def upsert_task(task):
-    global processed_events
+def finalize_upsert(task, embedding):
+    if not embedding:
+        logger.error("❌ Embedding failed for task %s", task["id"])
+        return None
+
+    return PointStruct(
+        id=task["id"],
+        vector=embedding,
+        payload=build_task_payload(task)
+    )
 
-    semantic_text = build_semantic_text(task)
-    embedding = generate_embedding(semantic_text)
+async def flush_upserts(points_buffer, wait=True):
+    global processed_events
 
-    if not embedding:
-        print(f"❌ Embedding failed for task {task['id']}")
+    if not points_buffer:
         return
 
-    payload = build_task_payload(task)
-
-    qdrant.upsert(
+    # wait=False only confirms receipt; callers that commit Kafka offsets
+    # afterwards need wait=True so the write is applied first
+    await qdrant.upsert(
         collection_name=QDRANT_COLLECTION,
-        points=[
-            PointStruct(
-                id=task["id"],
-                vector=embedding,
-                payload=payload
-            )
-        ]
+        points=points_buffer,
+        wait=wait
     )
 
-    processed_events += 1
-    print(f"✅ Upserted task {task['id']}")
+    processed_events += len(points_buffer)
+    logger.debug("✅ Upserted %d tasks", len(points_buffer))
+
+async def upsert_tasks(tasks, wait=True):
+    # returns the ids of tasks skipped because their embedding failed
+    embeddings = await generate_embeddings([build_semantic_text(t) for t in tasks])
+    points = []
+    failed = []
+    for task, embedding in zip(tasks, embeddings):
+        point = finalize_upsert(task, embedding)
+        if point:
+            points.append(point)
+        else:
+            failed.append(task["id"])
+    await flush_upserts(points, wait)
+    return failed
+
+async def delete_tasks(task_ids):
+    if not task_ids:
+        return
 
-def delete_task(task_id):
-    qdrant.delete(
+    await qdrant.delete(
         collection_name=QDRANT_COLLECTION,
-        points_selector=PointIdsList(points=[task_id])
+        points_selector=PointIdsList(points=list(task_ids))
     )
-    print(f"🗑️ Deleted task {task_id}")
+    logger.debug("🗑️ Deleted %d tasks", len(task_ids))
+
+# ==============================
+# CDC WORKERS
+# ==============================
+class CDCBatchError(Exception):
+    def __init__(self, task_ids):
+        super().__init__(f"Indexing failed for tasks {task_ids}")
+        self.task_ids = task_ids
+
+async def upsert_cdc_tasks(tasks):
+    # returns the ids that failed for a non-transient reason; transient
+    # errors propagate so the whole poll is redelivered
+    try:
+        return await upsert_tasks(tasks)
+    except Exception as e:
+        if is_transient(e):
+            raise
+        if len(tasks) == 1:
+            logger.error("❌ Task %s failed: %s", tasks[0]["id"], e)
+            return [tasks[0]["id"]]
+
+    # one bad row failed the batch; index the rest one by one around it
+    failed = []
+    for task in tasks:
+        failed += await upsert_cdc_tasks([task])
+    return failed
+
+async def apply_cdc_batch(events, pool):
+    # collapse to the final state per task: deletes are sent first, so an
+    # upsert that follows a delete of the same task still wins
+    upserts = {}
+    deletes = set()
+    for op, task in events:
+        if op == "d":
+            upserts.pop(task["id"], None)
+            deletes.add(task["id"])
+        else:
+            upserts[task["id"]] = task
+
+    await delete_tasks(deletes)
+    if upserts:
+        failed = await upsert_cdc_tasks(
+            await enrich_user_names(list(upserts.values()), pool)
+        )
+        # raising keeps the offsets uncommitted so the events come back
+        if failed:
+            raise CDCBatchError(failed)
+
+async def shard_worker(shard, pool, errors):
+    # one worker per shard keeps events for a given task in order, while
+    # different shards embed and upsert concurrently
+    while True:
+        events = [await shard.get()]
+        while len(events) < CDC_FLUSH_SIZE and not shard.empty():
+            events.append(shard.get_nowait())
+
+        try:
+            await apply_cdc_batch(events, pool)
+        except Exception as e:
+            logger.error("❌ CDC batch failed: %s", e)
+            errors.append(e)
+        finally:
+            for _ in events:
+                shard.task_done()
 
 # ==============================
 # MAIN
 # ==============================
-def main():
-    setup_qdrant()
+async def bulk_index(conn):
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+    batches = []
+    failures = []
+    total = 0
+
+    async def index_batch(batch):
+        try:
+            # nothing is committed on the bulk pass, so let Qdrant pipeline
+            await upsert_tasks(batch, wait=False)
+        except Exception as e:
+            failures.append(e)
+        finally:
+            semaphore.release()
+
+    async def schedule(batch):
+        # acquiring before create_task keeps at most BULK_CONCURRENCY
+        # batches buffered, so memory stays bounded on large tables
+        await semaphore.acquire()
+        batches.append(asyncio.create_task(index_batch(batch)))
+
+    # ---------- BULK INDEX (JOIN _user) ----------
+    # named cursor = server-side; rows stream in BULK_FETCH_SIZE chunks,
+    # fetched on a worker thread so in-flight upserts keep running
+    with conn.cursor(name="bulk_tasks", cursor_factory=RealDictCursor) as cur:
+        cur.execute(f"""
+        SELECT
+          t.*,
+          u1.name AS assigned_by_name,
+          u2.name AS assigned_to_name
+        FROM {SCHEMA}.task t
+        LEFT JOIN {SCHEMA}._user u1 ON u1.id = t.by_user_id
+        LEFT JOIN {SCHEMA}._user u2 ON u2.id = t.to_user_id
+        """)
+
+        logger.info("🚀 Bulk indexing tasks")
+        rows = []
+        while not failures:
+            fetched = await asyncio.to_thread(cur.fetchmany, BULK_FETCH_SIZE)
+            if not fetched:
+                break
+            rows.extend(fetched)
+            while len(rows) >= UPSERT_BATCH_SIZE:
+                total += UPSERT_BATCH_SIZE
+                await schedule(rows[:UPSERT_BATCH_SIZE])
+                rows = rows[UPSERT_BATCH_SIZE:]
+        if rows and not failures:
+            total += len(rows)
+            await schedule(rows)
+
+    await asyncio.gather(*batches)
+    if failures:
+        raise RuntimeError(
+            f"Bulk index failed in {len(failures)} batches"
+        ) from failures[0]
+
+    conn.commit()
+    logger.info("✅ Bulk indexed %d tasks", total)
+
+async def main():
+    await setup_qdrant()
 
     conn = psycopg2.connect(
         host=DB_HOST,
@@ -239,66 +687,122 @@ def main():
         password=DB_PWD,
         dbname=DB_NAME
     )
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-    # ---------- BULK INDEX (JOIN _user) ----------
-    cursor.execute(f"""
-    SELECT
-      t.*,
-      u1.name AS assigned_by_name,
-      u2.name AS assigned_to_name
-    FROM {SCHEMA}.task t
-    LEFT JOIN {SCHEMA}._user u1 ON u1.id = t.by_user_id
-    LEFT JOIN {SCHEMA}._user u2 ON u2.id = t.to_user_id
-    """)
-
-    rows = cursor.fetchall()
-    print(f"🚀 Bulk indexing {len(rows)} tasks")
-
-    for task in rows:
-        upsert_task(task)
+    await bulk_index(conn)
+    conn.close()
 
-    # ---------- CDC CONSUMER ----------
-    consumer = KafkaConsumer(
-        KAFKA_TOPIC,
-        bootstrap_servers=KAFKA_BOOTSTRAP,
-        value_deserializer=lambda x: json.loads(x.decode()),
-        group_id="qdrant-cdc-v1",
-        auto_offset_reset="latest",
-        enable_auto_commit=True
+    pool = ThreadedConnectionPool(
+        minconn=DB_POOL_MIN,
+        maxconn=DB_POOL_MAX,
+        host=DB_READ_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PWD,
+        dbname=DB_NAME
     )
 
+    # ---------- CDC CONSUMER ----------
+    # librdkafka prefetches on its own threads; consume() only hands over
+    # already-fetched messages, and runs off the event loop via to_thread
+    consumer = Consumer({
+        "bootstrap.servers": KAFKA_BOOTSTRAP,
+        "group.id": "qdrant-cdc-v1",
+        "auto.offset.reset": "latest",
+        # offsets are committed only once a polled batch is in Qdrant
+        "enable.auto.commit": False,
+        "fetch.min.bytes": KAFKA_FETCH_MIN_BYTES,
+        "fetch.wait.max.ms": KAFKA_FETCH_MAX_WAIT_MS,
+        "max.partition.fetch.bytes": KAFKA_MAX_PARTITION_FETCH_BYTES,
+    })
+    consumer.subscribe([KAFKA_TOPIC])
+
+    # unbounded: each poll is drained (join) before the next consume, so a
+    # shard never holds more than KAFKA_MAX_POLL_RECORDS events
+    shards = [asyncio.Queue() for _ in range(CDC_SHARDS)]
+    errors = []
+    workers = [
+        asyncio.create_task(shard_worker(q, pool, errors)) for q in shards
+    ]
+
     last_heartbeat = time.time()
-    print("🚀 CDC listener started")
+    retry_delay = CDC_RETRY_DELAY
+    # (topic, partition, offset) -> failed non-transient attempts
+    attempts = {}
+    logger.info("🚀 CDC listener started")
 
     while running:
-        records = consumer.poll(timeout_ms=1000, max_records=10)
-        for batch in records.values():
-            for record in batch:
-                value = record.value
-                payload = value.get("payload") if value else None
-                if not payload:
-                    continue
-
-                if payload.get("op") == "d":
-                    before = payload.get("before")
-                    if before:
-                        delete_task(before["id"])
-                else:
-                    after = payload.get("after")
-                    if after:
-                        after = enrich_user_names(after, cursor)
-                        upsert_task(after)
+        messages = await asyncio.to_thread(
+            consumer.consume,
+            num_messages=KAFKA_MAX_POLL_RECORDS,
+            timeout=1.0
+        )
+        first_offsets = {}
+        for msg in messages:
+            if msg.error():
+                logger.warning("⚠ Kafka error: %s", msg.error())
+                continue
+
+            first_offsets.setdefault((msg.topic(), msg.partition()), msg.offset())
+
+            raw = msg.value()
+            value = orjson.loads(raw) if raw else None
+            payload = value.get("payload") if value else None
+            if not payload:
+                continue
+
+            if payload.get("op") == "d":
+                event = ("d", payload.get("before"))
+            else:
+                event = ("u", payload.get("after"))
+            if event[1]:
+                shards[hash(event[1]["id"]) % CDC_SHARDS].put_nowait(event)
+
+        await asyncio.gather(*(q.join() for q in shards))
+
+        exhausted = False
+        if errors and not any(is_transient(e) for e in errors):
+            # a record that keeps failing would otherwise stall every
+            # partition behind it; count attempts from the same offsets
+            for (topic, partition), offset in first_offsets.items():
+                key = (topic, partition, offset)
+                attempts[key] = attempts.get(key, 0) + 1
+                exhausted = exhausted or attempts[key] >= CDC_MAX_ATTEMPTS
+
+        if errors and not exhausted:
+            # rewind so the failed batch is redelivered (at-least-once)
+            for (topic, partition), offset in first_offsets.items():
+                consumer.seek(TopicPartition(topic, partition, offset))
+            # back off so a lasting fault doesn't spin on redelivery
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, CDC_RETRY_MAX_DELAY)
+        elif first_offsets:
+            if exhausted:
+                skipped = [i for e in errors for i in getattr(e, "task_ids", ())]
+                logger.error(
+                    "☠ Skipping after %d attempts | tasks %s | errors %s",
+                    CDC_MAX_ATTEMPTS, skipped, errors
+                )
+            consumer.commit(asynchronous=True)
+            retry_delay = CDC_RETRY_DELAY
+            attempts.clear()
+        errors.clear()
 
         if time.time() - last_heartbeat > HEARTBEAT_INTERVAL:
             last_heartbeat = time.time()
-            print(f"💓 Alive | Events processed: {processed_events}")
+            logger.info("💓 Alive | Events processed: %d", processed_events)
+
+    logger.info("🛑 Graceful shutdown requested...")
+    for w in workers:
+        w.cancel()
 
     consumer.close()
-    cursor.close()
-    conn.close()
-    print("✅ Shutdown complete")
+    await qdrant.close()
+    pool.closeall()
+    logger.info("✅ Shutdown complete")
 
 if __name__ == "__main__":
-    main()
-
+    log_listener.start()
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
@@ -1,5 +1,7 @@
 import os
 import re
+from threading import Lock
+from cachetools import TTLCache
 from fastapi import FastAPI
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,11 +17,17 @@ QDRANT_URL = "your qdrant url"
 QDRANT_COLLECTION = "your collection name"
 GENAI_API_KEY = os.getenv("GENAI_API_KEY")
 EMBEDDING_MODEL = "your embedding model"
+QUERY_CACHE_SIZE = 4096
+QUERY_CACHE_TTL = 600  # seconds
 
 # ================= CLIENTS =================
 qdrant = QdrantClient(url=QDRANT_URL)
 genai_client = genai.Client(api_key=GENAI_API_KEY)
 
+# normalized query -> embedding; repeated searches skip the GenAI call
+_QUERY_CACHE = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+_QUERY_CACHE_LOCK = Lock()
+
 # ================= APP =================
 app = FastAPI()
 app.add_middleware(
@@ -45,36 +53,60 @@ def debug_all():
     return [p.payload for p in points]
 
 # ================= HELPERS =================
+_WS_RE = re.compile(r"\s+")
+
 def normalize_name(name: str | None):
     if not name:
         return None
-    return re.sub(r"\s+", " ", name.strip().lower())
+    return _WS_RE.sub(" ", name.strip().lower())
+
+def embed_query(query: str):
+    key = query.strip().casefold()
+    with _QUERY_CACHE_LOCK:
+        embedding = _QUERY_CACHE.get(key)
+    if embedding is not None:
+        return embedding
+
+    resp = genai_client.models.embed_content(
+        model=EMBEDDING_MODEL,
+        contents=query
+    )
+    embedding = resp.embeddings[0].values
+    with _QUERY_CACHE_LOCK:
+        _QUERY_CACHE[key] = embedding
+    return embedding
 
 # ================= QUERY PARSER =================
+_WORD_RE = re.compile(r"\b\w+\b")
+_ASSIGNED_TO_RE = re.compile(r"assigned to ([a-zA-Z ]+)")
+_ASSIGNED_BY_RE = re.compile(r"assigned by ([a-zA-Z ]+)")
+
+# ordered: the first match wins when a query names several
+_PRIORITIES = ("low", "medium", "high", "urgent")
+_STATUSES = ("pending", "active", "declined", "rejected", "draft", "deleted")
+_PRIORITY_SET = frozenset(_PRIORITIES)
+_STATUS_SET = frozenset(_STATUSES)
+
 def parse_query_to_filters(query: str):
-    q = query.lower()
-    words = set(re.findall(r"\b\w+\b", q))
+    q = query.casefold()
+    words = set(_WORD_RE.findall(q))
     filters = {}
 
     # ---------- PRIORITY ----------
-    for p in ["low", "medium", "high", "urgent"]:
-        if p in words:
-            filters["priority"] = p
-            break
+    if not words.isdisjoint(_PRIORITY_SET):
+        filters["priority"] = next(p for p in _PRIORITIES if p in words)
 
     # ---------- STATUS ----------
-    for s in ["pending", "active", "declined", "rejected", "draft", "deleted"]:
-        if s in words:
-            filters["status"] = s
-            break
+    if not words.isdisjoint(_STATUS_SET):
+        filters["status"] = next(s for s in _STATUSES if s in words)
 
     # ---------- ASSIGNED TO ----------
-    m = re.search(r"assigned to ([a-zA-Z ]+)", q)
+    m = _ASSIGNED_TO_RE.search(q)
     if m:
         filters["assigned_to_name"] = normalize_name(m.group(1))
 
     # ---------- ASSIGNED BY ----------
-    m = re.search(r"assigned by ([a-zA-Z ]+)", q)
+    m = _ASSIGNED_BY_RE.search(q)
     if m:
         filters["assigned_by_name"] = normalize_name(m.group(1))
 
@@ -107,11 +139,7 @@ async def search(payload: dict):
     # ---------- EMBEDDING ----------
     embedding = None
     try:
-        resp = genai_client.models.embed_content(
-            model=EMBEDDING_MODEL,
-            contents=query
-        )
-        embedding = resp.embeddings[0].values
+        embedding = embed_query(query)
     except Exception as e:
         print("Embedding failed:", e)
 
@@ -142,7 +170,7 @@ async def search(payload: dict):
         tasks.append({
             "id": p.get("task_id"),
             "title": p.get("title"),
-            "description": p.get("description"),
+            "description": p.get("description_preview"),
             "priority": p.get("priority"),
             "status": p.get("status"),
             "progress": p.get("progress"),